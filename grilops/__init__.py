@@ -11,6 +11,7 @@ See https://github.com/obijywk/grilops to learn more.
 
 __pdoc__ = {
   "fastz3": False,
+  "gridvalues": False,
   "quadtree": False,
 }
 
@@ -265,9 +265,7 @@ class Lattice:
         output = blank
       columns.append(output.split("\n"))
     for row in zip(*columns):
-      for col in row:
-        stream.write(col)
-      stream.write("\n")
+      stream.write("".join(row) + "\n")
 
   def print(
       self, hook_function: Callable[[Point], Optional[str]],
@@ -308,9 +306,7 @@ class RectangularLattice(Lattice):
   def __init__(self, points: List[Point]):
     super().__init__()
     self.__points = sorted(points)
-    self.__point_indices = {
-        p: i for i, p in enumerate(self.__points)
-    }
+    self.__point_indices = dict(zip(self.__points, range(len(self.__points))))
 
   @property
   def points(self) -> List[Point]:
@@ -480,9 +476,7 @@ class _HexagonalLattice(Lattice):
       if (p.y + p.x) % 2 == 1:
         raise ValueError("Hexagonal coordinates must have an even sum.")
     self.__points = sorted(points)
-    self.__point_indices = {
-        p: i for i, p in enumerate(self.__points)
-    }
+    self.__point_indices = dict(zip(self.__points, range(len(self.__points))))
 
   @property
   def points(self) -> List[Point]:
@@ -0,0 +1,88 @@
+"""Helpers for grids of integer or bit-vector z3 constants."""
+
+from typing import Dict, Optional, Union, cast
+from z3 import (
+    ArithRef, BitVec, BitVecNumRef, BitVecVal, Int, IntVal, ModelRef, Solver
+)
+
+from .geometry import Point
+
+
+class GridValueFactory:
+  """Creates z3 constants and values of a single sort for a constrainer's grids.
+
+  The sort is either integer, or a signed bit-vector wide enough to represent
+  every value from -max_value to max_value.
+  """
+
+  def __init__(self, use_bit_vectors: bool, max_value: int):
+    """
+    :param use_bit_vectors: If true, create bit-vector constants and values
+      instead of integer constants and values.
+    :param max_value: The largest magnitude of any value that will be stored in
+      or compared against the grids.
+    """
+    self.__max_value = max_value
+    self.__bit_vec_width: Optional[int] = None
+    if use_bit_vectors:
+      self.__bit_vec_width = max_value.bit_length() + 1
+    self.__vals: Dict[int, ArithRef] = {}
+
+  @property
+  def bit_vec_width(self) -> Optional[int]:
+    """The width of the bit-vectors, or None if using integers."""
+    return self.__bit_vec_width
+
+  def make_var(self, name: str) -> ArithRef:
+    """Returns a new z3 constant for use in one of the grids."""
+    if self.__bit_vec_width is not None:
+      return cast(ArithRef, BitVec(name, self.__bit_vec_width))
+    return Int(name)
+
+  def make_val(self, value: int) -> ArithRef:
+    """Returns a z3 value of the same sort as the grid constants.
+
+    Values are cached, so that all constraints comparing against the same
+    value share a single z3 expression.
+    """
+    val = self.__vals.get(value)
+    if val is None:
+      if self.__bit_vec_width is not None:
+        if abs(value) > self.__max_value:
+          raise RuntimeError(
+              f"{value} does not fit in a {self.__bit_vec_width}-bit "
+              "grid value")
+        val = cast(ArithRef, BitVecVal(value, self.__bit_vec_width))
+      else:
+        val = IntVal(value)
+      self.__vals[value] = val
+    return val
+
+
+def model_values(
+    solver_or_model: Union[Solver, ModelRef],
+    grid: Dict[Point, ArithRef],
+    signed: bool
+) -> Dict[Point, int]:
+  """Returns the value of each constant in a grid in a model.
+
+  :param solver_or_model: A checked `Solver`, or the model to read from.
+  :param grid: The grid of integer or bit-vector constants.
+  :param signed: If true, bit-vector values are read as signed integers.
+  """
+  if isinstance(solver_or_model, Solver):
+    model = solver_or_model.model()
+  else:
+    model = solver_or_model
+  values: Dict[Point, int] = {}
+  for p, v in grid.items():
+    # Look up the constant's interpretation directly, only falling back to
+    # evaluation if the model doesn't include it.
+    value = model[v]
+    if value is None:
+      value = model.eval(v)
+    if signed:
+      values[p] = cast(BitVecNumRef, value).as_signed_long()
+    else:
+      values[p] = value.as_long()
+  return values
@@ -5,9 +5,10 @@ These paths may be either closed (loops) or open ("terminated" paths).
 
 import itertools
 from collections import defaultdict
-from typing import Dict, Iterable, List, Optional, Tuple, cast
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, cast
 from z3 import (
-    And, ArithRef, BoolRef, BoolVal, If, Implies, Int, Not, Or, Sum
+    And, ArithRef, BitVecRef, BitVecVal, BoolRef, BoolVal, If, Implies, Int,
+    Not, Or, Sum, UGT, ULT, is_bv
 )
 
 
@@ -22,6 +23,9 @@ class PathSymbolSet(SymbolSet):
   Additional symbols (e.g. a `grilops.symbols.Symbol` representing an empty
   space) may be added to this `grilops.symbols.SymbolSet` by calling
   `grilops.symbols.SymbolSet.append` after it's constructed.
+
+  The symbol predicates (`PathSymbolSet.is_path` and friends) also accept
+  bit-vector symbol expressions, which are compared as unsigned values.
   """
 
   def __init__(self, lattice: Lattice, include_terminals: bool = True):
@@ -37,6 +41,11 @@ class PathSymbolSet(SymbolSet):
     self.__symbol_for_direction_pair: Dict[Tuple[Direction, Direction], int] = {}
     self.__terminal_for_direction: Dict[Direction, int] = {}
 
+    # Expressions returned by the symbol predicates, keyed by predicate name
+    # and the z3 AST id of the symbol. The symbol is stored alongside the
+    # expression so that its AST id can't be reused while it's cached.
+    self.__predicate_cache: Dict[Tuple[str, int], Tuple[ArithRef, BoolRef]] = {}
+
     dirs = lattice.edge_sharing_directions()
 
     for idx, (di, dj) in enumerate(itertools.combinations(dirs, 2)):
@@ -56,6 +65,37 @@ class PathSymbolSet(SymbolSet):
         self.__terminal_for_direction[d] = idx
         self.__max_path_terminal_symbol_index = idx
 
+  @staticmethod
+  def __less_than(symbol: ArithRef, value: int) -> BoolRef:
+    """Returns symbol < value, comparing bit-vectors as unsigned."""
+    if is_bv(symbol):
+      bv_symbol = cast(BitVecRef, symbol)
+      return ULT(bv_symbol, BitVecVal(value, bv_symbol.size()))
+    return symbol < value
+
+  @staticmethod
+  def __greater_than(symbol: ArithRef, value: int) -> BoolRef:
+    """Returns symbol > value, comparing bit-vectors as unsigned."""
+    if is_bv(symbol):
+      bv_symbol = cast(BitVecRef, symbol)
+      return UGT(bv_symbol, BitVecVal(value, bv_symbol.size()))
+    return symbol > value
+
+  def __cached_predicate(
+      self,
+      name: str,
+      symbol: ArithRef,
+      make_expr: Callable[[], BoolRef]
+  ) -> BoolRef:
+    """Returns a cached predicate expression, constructing it if needed."""
+    key = (name, symbol.get_id())
+    cached = self.__predicate_cache.get(key)
+    if cached is not None:
+      return cached[1]
+    expr = make_expr()
+    self.__predicate_cache[key] = (symbol, expr)
+    return expr
+
   def is_path(self, symbol: ArithRef) -> BoolRef:
     """Returns true if the given symbol represents part of a path.
 
@@ -64,8 +104,13 @@ class PathSymbolSet(SymbolSet):
     :return: A true `BoolRef` if the symbol represents part of a path.
     """
     if self.__include_terminals:
-      return symbol < self.__max_path_terminal_symbol_index + 1
-    return symbol < self.__max_path_segment_symbol_index + 1
+      max_path_symbol_index = self.__max_path_terminal_symbol_index
+    else:
+      max_path_symbol_index = self.__max_path_segment_symbol_index
+    return self.__cached_predicate(
+      "is_path", symbol,
+      lambda: self.__less_than(symbol, max_path_symbol_index + 1)
+    )
 
   def is_path_segment(self, symbol: ArithRef) -> BoolRef:
     """Returns true if the given symbol represents a non-terminal path segment.
@@ -75,7 +120,10 @@ class PathSymbolSet(SymbolSet):
     :return: A true `BoolRef` if the symbol represents a non-terminal path
       segment.
     """
-    return symbol < self.__max_path_segment_symbol_index + 1
+    return self.__cached_predicate(
+      "is_path_segment", symbol,
+      lambda: self.__less_than(symbol, self.__max_path_segment_symbol_index + 1)
+    )
 
   def is_terminal(self, symbol: ArithRef) -> BoolRef:
     """Returns true if the given symbol represents a path terminal.
@@ -86,9 +134,12 @@ class PathSymbolSet(SymbolSet):
     """
     if not self.__include_terminals:
       return BoolVal(False)
-    return And(
-      symbol > self.__max_path_segment_symbol_index,
-      symbol < self.__max_path_terminal_symbol_index + 1
+    return self.__cached_predicate(
+      "is_terminal", symbol,
+      lambda: And(
+        self.__greater_than(symbol, self.__max_path_segment_symbol_index),
+        self.__less_than(symbol, self.__max_path_terminal_symbol_index + 1)
+      )
     )
 
   def symbols_for_direction(self, d: Direction) -> List[int]:
@@ -143,6 +194,7 @@ class PathConstrainer:
     :param allow_loops: If True, finds paths that are loops. Defaults to True.
     """
     PathConstrainer._instance_index += 1
+    instance_index = PathConstrainer._instance_index
 
     self.__symbol_grid = symbol_grid
     self.__complete = complete
@@ -151,11 +203,11 @@ class PathConstrainer:
     self.__num_paths: Optional[ArithRef] = None
 
     self.__path_instance_grid: Dict[Point, ArithRef] = {
-      p: Int(f"pcpi-{PathConstrainer._instance_index}-{p.y}-{p.x}")
+      p: Int(f"pcpi-{instance_index}-{p.y}-{p.x}")
       for p in self.__symbol_grid.grid.keys()
     }
     self.__path_order_grid: Dict[Point, ArithRef] = {
-      p: Int(f"pcpo-{PathConstrainer._instance_index}-{p.y}-{p.x}")
+      p: Int(f"pcpo-{instance_index}-{p.y}-{p.x}")
       for p in self.__symbol_grid.grid.keys()
     }
 
@@ -1,6 +1,6 @@
 """Quadtree data structures for working with areas of points."""
 
-from typing import Callable, Dict, Iterator, List, Optional, TypeVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar, cast
 from z3 import BoolRef
 
 from .fastz3 import fast_and
@@ -21,17 +21,33 @@ class ExpressionQuadTree:
   def __init__(
       self,
       points: List[Point],
-      expr_funcs: Optional[Dict[ExprKey, Callable[[Point], BoolRef]]] = None
+      expr_funcs: Optional[Dict[ExprKey, Callable[[Point], BoolRef]]] = None,
+      expr_families: Optional[Dict[Any, Callable[[Any, Point], BoolRef]]] = None,
+      point_exprs: Optional[Dict[Tuple, BoolRef]] = None
   ):
     if not points:
       raise ValueError("a quadtree node must be constructed with at least one point")
 
     self.__exprs: Dict[ExprKey, BoolRef] = {}
+    # Expressions for single points, keyed by (ExprKey, Point), shared by all
+    # nodes of the tree so that they can be looked up without descending it.
+    self.__point_exprs: Dict[Tuple, BoolRef]
+    if point_exprs is not None:
+      self.__point_exprs = point_exprs
+    else:
+      self.__point_exprs = {}
+    # Keyed by (ExprKey, frozenset of excluded points).
+    self.__other_points_exprs: Dict[Tuple, BoolRef] = {}
     self.__expr_funcs: Dict[ExprKey, Callable[[Point], BoolRef]]
     if expr_funcs is not None:
       self.__expr_funcs = expr_funcs
     else:
       self.__expr_funcs = {}
+    self.__expr_families: Dict[Any, Callable[[Any, Point], BoolRef]]
+    if expr_families is not None:
+      self.__expr_families = expr_families
+    else:
+      self.__expr_families = {}
 
     self._point: Optional[Point]
     if len(points) == 1:
@@ -49,7 +65,12 @@ class ExpressionQuadTree:
       def make(cond):
         quad_points = [p for p in points if cond(p)]
         if quad_points:
-          return ExpressionQuadTree(quad_points, expr_funcs=self.__expr_funcs)
+          return ExpressionQuadTree(
+              quad_points,
+              expr_funcs=self.__expr_funcs,
+              expr_families=self.__expr_families,
+              point_exprs=self.__point_exprs
+          )
         return None
 
       self._tl = make(lambda p: p.y < self._ymid and p.x < self._xmid)
@@ -76,27 +97,49 @@ class ExpressionQuadTree:
     """Registers an expression constructor, to be called for each point."""
     self.__expr_funcs[key] = expr_func
 
+  def add_expr_family(
+      self, family: Any, expr_func: Callable[[Any, Point], BoolRef]):
+    """Registers an expression constructor for a family of keys.
+
+    The constructor is used for every key of the form (family, arg) that
+    hasn't been registered with `add_expr`, and is called with arg and each
+    point.
+    """
+    self.__expr_families[family] = expr_func
+
+  def __make_expr(self, key: ExprKey, p: Point) -> BoolRef:
+    """Constructs the expression for the given key and point."""
+    expr_func = self.__expr_funcs.get(key)
+    if expr_func is not None:
+      return expr_func(p)
+    family, arg = cast(Tuple[Any, Any], key)
+    return self.__expr_families[family](arg, p)
+
+  def __get_leaf_expr(self, key: ExprKey) -> BoolRef:
+    """Returns the expression for this leaf node's point."""
+    point_key = (key, self._point)
+    expr = self.__point_exprs.get(point_key)
+    if expr is None:
+      expr = self.__make_expr(key, cast(Point, self._point))
+      self.__point_exprs[point_key] = expr
+    return expr
+
   def get_exprs(self, key: ExprKey) -> Iterator[BoolRef]:
     """Returns expressions for all points covered by this tree node."""
     if self._point:
-      expr = self.__exprs.get(key)
-      if expr is None:
-        expr = self.__expr_funcs[key](self._point)
-        self.__exprs[key] = expr
-      yield expr
+      yield self.__get_leaf_expr(key)
     else:
       for q in self._quads:
         yield from q.get_exprs(key)
 
   def get_point_expr(self, key: ExprKey, p: Point) -> BoolRef:
     """Returns the expression for the given point."""
+    expr = self.__point_exprs.get((key, p))
+    if expr is not None:
+      return expr
     if self._point:
       if self._point == p:
-        expr = self.__exprs.get(key)
-        if expr is None:
-          expr = self.__expr_funcs[key](self._point)
-          self.__exprs[key] = expr
-        return expr
+        return self.__get_leaf_expr(key)
       raise ValueError(f"point {p} not in QuadTree")
     if self._tl and p.y < self._ymid and p.x < self._xmid:
       return self._tl.get_point_expr(key, p)
@@ -109,7 +152,12 @@ class ExpressionQuadTree:
     raise ValueError(f"point {p} not in QuadTree")
 
   def get_other_points_expr(self, key: ExprKey, points: List[Point]):
-    """Returns the conjunction of all expressions, excluding given points."""
+    """Returns the conjunction of all expressions, excluding given points.
+
+    The order of the given points doesn't matter. Expressions are cached for
+    each set of excluded points covered by a tree node, so repeated requests
+    excluding the same points reuse the same expression.
+    """
     if self._point:
       if self._point not in points:
         return self.get_point_expr(key, self._point)
@@ -117,12 +165,17 @@ class ExpressionQuadTree:
 
     covered_points = [p for p in points if self.covers_point(p)]
     if covered_points:
-      terms = []
-      for q in self._quads:
-        expr = q.get_other_points_expr(key, covered_points)
-        if expr is not None:
-          terms.append(expr)
-      return fast_and(*terms)
+      cache_key = (key, frozenset(covered_points))
+      expr = self.__other_points_exprs.get(cache_key)
+      if expr is None:
+        terms = []
+        for q in self._quads:
+          q_expr = q.get_other_points_expr(key, covered_points)
+          if q_expr is not None:
+            terms.append(q_expr)
+        expr = fast_and(*terms)
+        self.__other_points_exprs[cache_key] = expr
+      return expr
 
     expr = self.__exprs.get(key)
     if expr is None:
@@ -6,11 +6,17 @@ in its subtree are exposed by properties of the `RegionConstrainer`.
 """
 
 import itertools
+from contextlib import contextmanager
 
-from typing import Dict, Optional
-from z3 import And, ArithRef, If, Implies, Int, IntVal, Or, Solver, Sum
+from typing import Dict, Iterator, List, Optional, Tuple, cast
+from z3 import (
+    And, ArithRef, BitVecRef, BoolRef, If, Implies, Or, Solver,
+    Sum, UGE, ULE, ZeroExt
+)
 
-from .geometry import Direction, Lattice, Point
+from .fastz3 import fast_and
+from .geometry import Direction, Lattice, Point, Vector
+from .gridvalues import GridValueFactory, model_values
 
 
 X: int = 0
@@ -22,6 +28,20 @@ R: int = 1
   root of its region's subtree."""
 
 
+def _balanced_sum(terms: List[ArithRef]) -> ArithRef:
+  """Returns the sum of bit-vector terms as a balanced tree of additions.
+
+  z3's `Sum` folds bit-vector terms into a left-leaning chain of additions
+  starting from an extra zero constant, so the terms are added pairwise instead.
+  """
+  while len(terms) > 1:
+    paired = [a + b for a, b in zip(terms[::2], terms[1::2])]
+    if len(terms) % 2:
+      paired.append(terms[-1])
+    terms = paired
+  return terms[0]
+
+
 class RegionConstrainer:  # pylint: disable=R0902
   """Creates constraints for grouping cells into contiguous regions."""
   _instance_index = 0
@@ -33,7 +53,8 @@ class RegionConstrainer:  # pylint: disable=R0902
       complete: bool = True,
       rectangular: bool = False,
       min_region_size: Optional[int] = None,
-      max_region_size: Optional[int] = None
+      max_region_size: Optional[int] = None,
+      use_bit_vectors: bool = False
   ):
     """
     :param lattice: The structure of the grid.
@@ -46,9 +67,16 @@ class RegionConstrainer:  # pylint: disable=R0902
       same region when possible.
     :param min_region_size: The minimum possible size of a region.
     :param max_region_size: The maximum possible size of a region.
+    :param use_bit_vectors: If true, the grids will contain z3 bit-vector
+      constants instead of integer constants, which may be faster to solve.
+      Bit-vector constants can't be mixed with integer expressions, so any
+      constraints relating these grids to other grids must also use
+      bit-vectors of the same width. Defaults to false.
     """
     RegionConstrainer._instance_index += 1
     self.__lattice = lattice
+    self.__points = lattice.points
+    self.__edge_sharing_directions = lattice.edge_sharing_directions()
     if solver:
       self.__solver = solver
     else:
@@ -61,8 +89,21 @@ class RegionConstrainer:  # pylint: disable=R0902
     if max_region_size is not None:
       self.__max_region_size = max_region_size
     else:
-      self.__max_region_size = len(self.__lattice.points)
+      self.__max_region_size = len(self.__points)
     self.__manage_edge_sharing_directions()
+    self.__find_cell_sides()
+    self.__values = GridValueFactory(
+        use_bit_vectors,
+        max(
+            len(self.__points),
+            self.__min_region_size,
+            self.__max_region_size,
+            len(self.__parent_types)
+        )
+    )
+    self.__bit_vec_width = self.__values.bit_vec_width
+    self.__make_var = self.__values.make_var
+    self.__make_val = self.__values.make_val
     self.__create_grids()
     self.__add_constraints()
     if rectangular:
@@ -72,140 +113,242 @@ class RegionConstrainer:  # pylint: disable=R0902
     """Creates the structures used for managing edge-sharing directions.
 
     Creates the mapping between edge-sharing directions and the parent
-    indices corresponding to them.
+    indices corresponding to them, and the table of sides checked for each
+    cell when adding constraints.
     """
     self.__edge_sharing_direction_to_index: Dict[Direction, int] = {}
     self.__parent_type_to_index = {"X": X, "R": R}
     self.__parent_types = ["X", "R"]
-    for d in self.__lattice.edge_sharing_directions():
+    for d in self.__edge_sharing_directions:
       index = len(self.__parent_types)
       self.__parent_type_to_index[d.name] = index
       self.__edge_sharing_direction_to_index[d] = index
       self.__parent_types.append(d.name)
 
-  def __create_grids(self):
+    # For each edge-sharing direction, the offset to the neighboring cell, the
+    # parent index the neighbor has if a cell is its parent, and the parent
+    # index a cell has if the neighbor is its parent.
+    self.__sides: List[Tuple[Vector, int, int]] = [
+        (
+            d.vector,
+            self.__edge_sharing_direction_to_index[
+                self.__lattice.opposite_direction(d)],
+            self.__edge_sharing_direction_to_index[d],
+        )
+        for d in self.__edge_sharing_directions
+    ]
+
+  def __find_cell_sides(self):
+    """Finds the neighboring cell on each edge-sharing side of each cell.
+
+    For each cell, records a list of (neighbor point, neighbor parent index,
+    own parent index) tuples, one per edge-sharing direction. The neighbor
+    point is None if the neighbor would be outside of the lattice.
+    """
+    points = set(self.__points)
+    self.__cell_sides: Dict[Point, List[Tuple[Optional[Point], int, int]]] = {}
+    for p in self.__points:
+      cell_sides = []
+      for vector, opposite_index, d_index in self.__sides:
+        sp: Optional[Point] = p.translate(vector)
+        if sp not in points:
+          sp = None
+        cell_sides.append((sp, opposite_index, d_index))
+      self.__cell_sides[p] = cell_sides
+
+  def __range_constraints(
+      self, v: ArithRef, lower: int, upper: int) -> List[BoolRef]:
+    """Returns constraints requiring that lower <= v <= upper.
+
+    When using bit-vectors and the range is non-negative, the bounds are
+    expressed as unsigned comparisons, so that a single comparison against
+    the upper bound also rules out all negative values.
+    """
+    if self.__bit_vec_width is not None and lower >= 0:
+      bv = cast(BitVecRef, v)
+      constraints = [ULE(bv, cast(BitVecRef, self.__make_val(upper)))]
+      if lower > 0:
+        constraints.append(UGE(bv, cast(BitVecRef, self.__make_val(lower))))
+      return constraints
+    return [v >= self.__make_val(lower), v <= self.__make_val(upper)]
+
+  def __create_grids(self):  # pylint: disable=R0914,R0915
     """Create the grids used to model region constraints."""
-    self.__parent_grid: Dict[Point, ArithRef] = {}
-    for p in self.__lattice.points:
-      v = Int(f"rcp-{RegionConstrainer._instance_index}-{p.y}-{p.x}")
-      if self.__complete:
-        self.__solver.add(v >= R)
-      else:
-        self.__solver.add(v >= X)
-      self.__solver.add(v < len(self.__parent_types))
-      self.__parent_grid[p] = v
+    instance_index = RegionConstrainer._instance_index
+    # z3 values for each parent index, so that a single value is shared by all
+    # comparisons against it.
+    self.__parent_values = [
+        self.__make_val(i) for i in range(len(self.__parent_types))]
+    parent_x = self.__parent_values[X]
+    parent_r = self.__parent_values[R]
+
+    complete = self.__complete
+    num_points = len(self.__points)
+    parent_lower = R if complete else X
+    parent_upper = len(self.__parent_types) - 1
+    subtree_size_lower = 1 if complete else 0
+    region_id_lower = 0 if complete else -1
+    minus_one = self.__make_val(-1)
+    min_region_size = self.__make_val(self.__min_region_size)
+    max_region_size = self.__make_val(self.__max_region_size)
 
+    self.__parent_grid: Dict[Point, ArithRef] = {}
     self.__subtree_size_grid: Dict[Point, ArithRef] = {}
-    for p in self.__lattice.points:
-      v = Int(f"rcss-{RegionConstrainer._instance_index}-{p.y}-{p.x}")
-      if self.__complete:
-        self.__solver.add(v >= 1)
-      else:
-        self.__solver.add(v >= 0)
-      self.__solver.add(v <= self.__max_region_size)
-      self.__subtree_size_grid[p] = v
-
     self.__region_id_grid: Dict[Point, ArithRef] = {}
-    for p in self.__lattice.points:
-      v = Int(f"rcid-{RegionConstrainer._instance_index}-{p.y}-{p.x}")
-      if self.__complete:
-        self.__solver.add(v >= 0)
-      else:
-        self.__solver.add(v >= -1)
-      self.__solver.add(v < len(self.__lattice.points))
-      parent = self.__parent_grid[p]
-      self.__solver.add(Implies(parent == X, v == -1))
-      point_index = self.__lattice.point_to_index(p)
-      assert point_index is not None
-      self.__solver.add(Implies(
-          parent == R,
-          v == point_index
-      ))
-      self.__region_id_grid[p] = v
-
     self.__region_size_grid: Dict[Point, ArithRef] = {}
-    for p in self.__lattice.points:
-      v = Int(f"rcrs-{RegionConstrainer._instance_index}-{p.y}-{p.x}")
-      if self.__complete:
-        self.__solver.add(v >= self.__min_region_size)
+    # The parent == X and parent == R predicates for each cell, shared by all
+    # of the constraints that refer to them.
+    self.__parent_is_x: Dict[Point, BoolRef] = {}
+    self.__parent_is_r: Dict[Point, BoolRef] = {}
+    constraints: List[BoolRef] = []
+    for point_index, p in enumerate(self.__points):
+      suffix = f"{instance_index}-{p.y}-{p.x}"
+      parent = self.__make_var(f"rcp-{suffix}")
+      subtree_size = self.__make_var(f"rcss-{suffix}")
+      region_id = self.__make_var(f"rcid-{suffix}")
+      region_size = self.__make_var(f"rcrs-{suffix}")
+      parent_is_x = parent == parent_x
+      parent_is_r = parent == parent_r
+
+      # A cell's parent may only be a neighbor within the lattice, so restrict
+      # the parent values of cells on the edge of the lattice to those that
+      # are legal for them.
+      missing_indices = [
+          d_index for sp, _, d_index in self.__cell_sides[p] if sp is None
+      ]
+      if missing_indices:
+        constraints.append(Or(*[
+            parent == self.__parent_values[i]
+            for i in range(parent_lower, parent_upper + 1)
+            if i not in missing_indices
+        ]))
       else:
-        self.__solver.add(Or(v >= self.__min_region_size, v == -1))
-      self.__solver.add(v <= self.__max_region_size)
-      parent = self.__parent_grid[p]
-      subtree_size = self.__subtree_size_grid[p]
-      self.__solver.add(Implies(parent == X, v == -1))
-      self.__solver.add(Implies(parent == R, v == subtree_size))
-      self.__region_size_grid[p] = v
-
-  def __add_constraints(self):
-    """Add constraints to the region modeling grids."""
-    def constrain_side(p, sp, sd):
-      self.__solver.add(Implies(
-          self.__parent_grid[p] == X,
-          self.__parent_grid[sp] != sd
-      ))
-      self.__solver.add(Implies(
-          self.__parent_grid[sp] == sd,
+        constraints.extend(self.__range_constraints(
+            parent, parent_lower, parent_upper))
+      constraints.extend(self.__range_constraints(
+          subtree_size, subtree_size_lower, self.__max_region_size))
+      constraints.extend(self.__range_constraints(
+          region_id, region_id_lower, num_points - 1))
+      if complete:
+        constraints.append(region_size >= min_region_size)
+      else:
+        constraints.append(
+            Or(region_size >= min_region_size, region_size == minus_one))
+        constraints.append(
+            Implies(
+                parent_is_x,
+                And(region_id == minus_one, region_size == minus_one)
+            ))
+      constraints.append(region_size <= max_region_size)
+      constraints.append(Implies(
+          parent_is_r,
           And(
-              self.__region_id_grid[p] == self.__region_id_grid[sp],
-              self.__region_size_grid[p] == self.__region_size_grid[sp],
+              region_id == self.__make_val(point_index),
+              region_size == subtree_size
           )
       ))
 
-    def subtree_size_term(sp, sd):
-      return If(
-          self.__parent_grid[sp] == sd,
-          self.__subtree_size_grid[sp],
-          IntVal(0)
-      )
-
-    for p in self.__lattice.points:
-      parent = self.__parent_grid[p]
-      subtree_size_terms = [If(parent != X, 1, 0)]
-
-      for d in self.__lattice.edge_sharing_directions():
-        sp = p.translate(d.vector)
-        if sp in self.__parent_grid:
-          opposite_index: int = self.__edge_sharing_direction_to_index[
-              self.__lattice.opposite_direction(d)]
-          constrain_side(p, sp, opposite_index)
-          subtree_size_terms.append(subtree_size_term(sp, opposite_index))
-        else:
-          d_index = self.__edge_sharing_direction_to_index[d]
-          self.__solver.add(parent != d_index)
-
-      self.__solver.add(
-          self.__subtree_size_grid[p] == Sum(*subtree_size_terms)
-      )
+      self.__parent_grid[p] = parent
+      self.__subtree_size_grid[p] = subtree_size
+      self.__region_id_grid[p] = region_id
+      self.__region_size_grid[p] = region_size
+      self.__parent_is_x[p] = parent_is_x
+      self.__parent_is_r[p] = parent_is_r
+    self.__solver.add(fast_and(*constraints))
 
-  def __add_rectangular_constraints(self):
-    for p in self.__lattice.points:
-      neighbors = self.__lattice.edge_sharing_neighbors(
-          self.__region_id_grid, p)
-      for n1, n2 in itertools.combinations(neighbors, 2):
-        n1_neighbors = self.__lattice.edge_sharing_neighbors(
-            self.__region_id_grid, n1.location)
-        n2_neighbors = self.__lattice.edge_sharing_neighbors(
-            self.__region_id_grid, n2.location)
-        common_points = (
-            set(n.location for n in n1_neighbors) &
-            set(n.location for n in n2_neighbors) -
-            {p}
+  def __add_constraints(self):  # pylint: disable=R0914
+    """Add constraints to the region modeling grids."""
+    zero = self.__make_val(0)
+    one = self.__make_val(1)
+    constraints: List[BoolRef] = []
+    add = constraints.append
+    parent_values = self.__parent_values
+
+    # The terms summed to compute subtree sizes. When using bit-vectors, these
+    # are widened (once per constant) so that the sum can't overflow and wrap
+    # around.
+    sum_grid = self.__subtree_size_grid
+    if self.__bit_vec_width is not None:
+      extension = (len(self.__sides) + 1).bit_length()
+      def extend(v: ArithRef) -> ArithRef:
+        return cast(ArithRef, ZeroExt(extension, cast(BitVecRef, v)))
+      sum_grid = {p: extend(v) for p, v in sum_grid.items()}
+      zero = extend(zero)
+      one = extend(one)
+
+    # The parent, region id, region size and subtree size sum term of each
+    # cell, so that a neighbor's constants can be fetched with a single lookup.
+    cells = {
+        p: (
+            self.__parent_grid[p],
+            self.__region_id_grid[p],
+            self.__region_size_grid[p],
+            sum_grid[p],
         )
+        for p in self.__points
+    }
+
+    for p in self.__points:
+      parent_is_x = self.__parent_is_x[p]
+      _, region_id, region_size, subtree_size_sum = cells[p]
+      # When complete, no cell's parent may be X, so every cell counts itself.
+      subtree_size_terms: List[ArithRef] = [
+          one if self.__complete else If(parent_is_x, zero, one)
+      ]
+      not_child_terms = []
+
+      for sp, opposite_index, _ in self.__cell_sides[p]:
+        if sp is None:
+          continue
+        side_parent, side_region_id, side_region_size, side_sum = cells[sp]
+        side_is_child = side_parent == parent_values[opposite_index]
+        add(Implies(
+            side_is_child,
+            And(region_id == side_region_id, region_size == side_region_size)
+        ))
+        subtree_size_terms.append(If(side_is_child, side_sum, zero))
+        not_child_terms.append(side_parent != parent_values[opposite_index])
+
+      # A cell that's not part of a region may not be the parent of any of its
+      # neighbors.
+      if not self.__complete and not_child_terms:
+        add(Implies(parent_is_x, fast_and(*not_child_terms)))
+
+      if self.__bit_vec_width is not None:
+        add(subtree_size_sum == _balanced_sum(subtree_size_terms))
+      else:
+        add(subtree_size_sum == Sum(*subtree_size_terms))
+
+    self.__solver.add(fast_and(*constraints))
+
+  def __add_rectangular_constraints(self):
+    region_id_grid = self.__region_id_grid
+    minus_one = self.__make_val(-1)
+    neighbors = {
+        p: [sp for sp, _, _ in cell_sides if sp is not None]
+        for p, cell_sides in self.__cell_sides.items()
+    }
+    neighbor_sets = {p: frozenset(ns) for p, ns in neighbors.items()}
+    constraints = []
+    for p in self.__points:
+      region_id = region_id_grid[p]
+      in_region = region_id != minus_one
+      # Whether each neighbor is in the same region, shared by all of the
+      # pairs that include that neighbor.
+      same_region = {n: region_id_grid[n] == region_id for n in neighbors[p]}
+      for n1, n2 in itertools.combinations(neighbors[p], 2):
+        common_points = neighbor_sets[n1] & neighbor_sets[n2] - {p}
         if common_points:
-          self.__solver.add(
+          constraints.append(
               Implies(
-                  And(
-                      n1.symbol == self.__region_id_grid[p],
-                      n2.symbol == self.__region_id_grid[p],
-                      self.__region_id_grid[p] != -1
-                  ),
+                  And(same_region[n1], same_region[n2], in_region),
                   And(*[
-                      self.__region_id_grid[cp] == self.__region_id_grid[p]
+                      region_id_grid[cp] == region_id
                       for cp in common_points
                   ])
               )
           )
+    self.__solver.add(fast_and(*constraints))
 
   def edge_sharing_direction_to_index(self, direction: Direction) -> int:
     """Returns the `RegionConstrainer.parent_grid` value for the direction.
@@ -236,6 +379,33 @@ class RegionConstrainer:  # pylint: disable=R0902
     """The `Solver` associated with this `RegionConstrainer`."""
     return self.__solver
 
+  def push(self):
+    """Creates a backtracking point in the solver.
+
+    Constraints added after this call are discarded by the matching call to
+    `RegionConstrainer.pop`, while the region constraints (and anything the
+    solver has learned about them) are retained.
+    """
+    self.__solver.push()
+
+  def pop(self):
+    """Backtracks the solver to the most recent `RegionConstrainer.push`."""
+    self.__solver.pop()
+
+  @contextmanager
+  def scope(self) -> Iterator[Solver]:
+    """Returns a context manager that pushes and pops the solver.
+
+    This is useful for checking several sets of puzzle-specific constraints
+    against the same region constraints, without constructing a new
+    `RegionConstrainer` for each set.
+    """
+    self.push()
+    try:
+      yield self.__solver
+    finally:
+      self.pop()
+
   @property
   def region_id_grid(self) -> Dict[Point, ArithRef]:
     """A dictionary of numbers identifying regions.
@@ -283,12 +453,12 @@ class RegionConstrainer:  # pylint: disable=R0902
         "SW": chr(0x2B69),
     }
 
-    model = self.__solver.model()
+    parent_indices = model_values(
+        self.__solver, self.__parent_grid,
+        self.__bit_vec_width is not None)
 
     def print_function(p):
-      v = self.__parent_grid[p]
-      parent_index = model.eval(v).as_long()
-      parent_type = self.__parent_types[parent_index]
+      parent_type = self.__parent_types[parent_indices[p]]
       return labels[parent_type]
 
     self.__lattice.print(print_function, " ")
@@ -298,36 +468,27 @@ class RegionConstrainer:  # pylint: disable=R0902
 
     Should be called only after the solver has been checked.
     """
-    model = self.__solver.model()
-    def print_function(p):
-      v = self.__subtree_size_grid[p]
-      value = model.eval(v).as_long()
-      return f"{value:3}"
-
-    self.__lattice.print(print_function, "   ")
+    values = model_values(
+        self.__solver, self.__subtree_size_grid,
+        self.__bit_vec_width is not None)
+    self.__lattice.print(lambda p: f"{values[p]:3}", "   ")
 
   def print_region_ids(self):
     """Prints a number identifying the region that owns each cell.
 
     Should be called only after the solver has been checked.
     """
-    model = self.__solver.model()
-    def print_function(p):
-      v = self.__region_id_grid[p]
-      value = model.eval(v).as_long()
-      return f"{value:3}"
-
-    self.__lattice.print(print_function, "   ")
+    values = model_values(
+        self.__solver, self.__region_id_grid,
+        self.__bit_vec_width is not None)
+    self.__lattice.print(lambda p: f"{values[p]:3}", "   ")
 
   def print_region_sizes(self):
     """Prints the size of the region that contains each cell.
 
     Should be called only after the solver has been checked.
     """
-    model = self.__solver.model()
-    def print_function(p):
-      v = self.__region_size_grid[p]
-      value = model.eval(v).as_long()
-      return f"{value:3}"
-
-    self.__lattice.print(print_function, "   ")
+    values = model_values(
+        self.__solver, self.__region_size_grid,
+        self.__bit_vec_width is not None)
+    self.__lattice.print(lambda p: f"{values[p]:3}", "   ")
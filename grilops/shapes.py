@@ -1,13 +1,17 @@
 """This module supports puzzles that place fixed shape regions into the grid."""
 
 from collections import defaultdict
-from functools import partial
+from operator import itemgetter
 import sys
 from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar, Union, cast
-from z3 import ArithRef, BoolRef, Const, ExprRef, Int, IntSort, IntVal, Or, Solver, PbEq, eq
+from z3 import (
+    ArithRef, BitVecRef, Bool, BoolRef, BoolVal, Const, ExprRef,
+    Implies, IntSort, Or, Solver, PbEq, ULE, eq
+)
 
 from .fastz3 import fast_and, fast_eq, fast_ne
 from .geometry import Lattice, Point, Vector
+from .gridvalues import GridValueFactory, model_values
 from .quadtree import ExpressionQuadTree
 
 
@@ -68,9 +72,10 @@ class Shape(Generic[Payload]):
       shape, i.e., in sorted order and with first offset equal to
       `grilops.geometry.Vector`(0, 0).
     """
-    offset_tuples = sorted(self.__offset_tuples, key=lambda t: t[0])
-    first_negated = offset_tuples[0][0].negate()
-    return Shape([(v.translate(first_negated), p) for v, p in offset_tuples])
+    return Shape([
+        (Vector(dy, dx), p)
+        for dy, dx, p in _canonical_offsets(self.__offset_tuples)
+    ])
 
   def equivalent(self, shape: "Shape") -> bool:  # pylint: disable=R0911
     """Returns true iff the given shape is equivalent to this shape."""
@@ -96,9 +101,31 @@ class Shape(Generic[Payload]):
     return True
 
 
+def _canonical_offsets(
+    offset_tuples: List[Tuple[Vector, Optional[Payload]]]
+) -> List[Tuple[int, int, Optional[Payload]]]:
+  """Returns the sorted (dy, dx, payload) tuples of a canonicalized shape."""
+  offset_tuples = sorted(offset_tuples, key=itemgetter(0))
+  first_dy, first_dx = offset_tuples[0][0]
+  return [(dy - first_dy, dx - first_dx, p) for (dy, dx), p in offset_tuples]
+
+
+def _payload_key(payload) -> object:
+  """Returns a hashable key that's equal for equal payloads.
+
+  z3 expressions are hash-consed, so equal payload expressions share an id.
+  """
+  if isinstance(payload, ExprRef):
+    return ("expr", payload.get_id())
+  return payload
+
+
 class ShapeConstrainer(Generic[Payload]):
   """Creates constraints for placing fixed shape regions into the grid."""
   _instance_index = 0
+  # Variants of previously seen shapes, keyed by lattice type, allowed
+  # transformations, and canonical shape key.
+  _variants_cache: Dict[Tuple, List[Shape]] = {}
 
   def __init__(  # pylint: disable=R0913
       self,
@@ -108,7 +135,9 @@ class ShapeConstrainer(Generic[Payload]):
       complete: bool = False,
       allow_rotations: bool = False,
       allow_reflections: bool = False,
-      allow_copies: bool = False
+      allow_copies: bool = False,
+      break_symmetries: bool = True,
+      use_bit_vectors: bool = False
   ):
     """
     :param lattice: The structure of the grid.
@@ -124,6 +153,15 @@ class ShapeConstrainer(Generic[Payload]):
       placed in the grid. Defaults to false.
     :param allow_copies: If true, allow any number of copies of the shapes to
       be placed in the grid. Defaults to false.
+    :param break_symmetries: If true and allow_copies is false, require the
+      instance IDs of equivalent shapes to increase with their indices in the
+      shapes list, so that the solver doesn't explore interchanged placements
+      of them. Set to false if constraints distinguish between equivalent
+      shapes by index. Defaults to true.
+    :param use_bit_vectors: If true, the shape type and shape instance grids
+      hold signed z3 bit-vectors rather than integers, which the solver may
+      handle faster. Other constraints on these grids then need bit-vector
+      expressions of matching width. Defaults to false.
     """
     ShapeConstrainer._instance_index += 1
     if solver:
@@ -133,47 +171,98 @@ class ShapeConstrainer(Generic[Payload]):
 
     self.__lattice = lattice
     self.__complete = complete
+    self.__bounding_box = (
+        min(p.y for p in lattice.points),
+        min(p.x for p in lattice.points),
+        max(p.y for p in lattice.points),
+        max(p.x for p in lattice.points),
+    )
     self.__allow_copies = allow_copies
+    self.__break_symmetries = break_symmetries
 
     self.__shapes = shapes
+    self.__values = GridValueFactory(
+        use_bit_vectors, max(len(lattice.points), len(shapes)))
+    self.__bit_vec_width = self.__values.bit_vec_width
+    self.__make_var = self.__values.make_var
+    self.__make_val = self.__values.make_val
     self.__make_variants(allow_rotations, allow_reflections)
 
     self.__create_grids()
     self.__add_constraints()
 
   def __make_variants(self, allow_rotations, allow_reflections):
-    fs = self.__lattice.transformation_functions(
-        allow_rotations, allow_reflections)
+    # The lattice's transformation functions are only needed for shapes whose
+    # variants haven't been computed yet.
+    fs = None
     self.__variants = []
+    # Shapes are often repeated to allow multiple copies of them, or shared
+    # among several constrainers, so reuse the variants computed for an
+    # earlier equivalent shape when possible.
+    computed = ShapeConstrainer._variants_cache
     for shape in self.__shapes:
-      shape_variants: List[Shape] = []
-      for f in fs:
-        variant = shape.transform(f).canonicalize()
-        if not any(variant.equivalent(v) for v in shape_variants):
-          shape_variants.append(variant)
+      shape_key = (
+          type(self.__lattice),
+          allow_rotations,
+          allow_reflections,
+          tuple(
+              (dy, dx, _payload_key(p))
+              for dy, dx, p in _canonical_offsets(shape.offsets_with_payloads)
+          ),
+      )
+      shape_variants = computed.get(shape_key)
+      if shape_variants is None:
+        if fs is None:
+          fs = self.__lattice.transformation_functions(
+              allow_rotations, allow_reflections)
+        # Deduplicate the transformed offsets as plain tuples, and only build
+        # a Shape for each distinct variant.
+        offset_tuples = shape.offsets_with_payloads
+        variant_offsets: Dict[Tuple, List] = {}
+        for f in fs:
+          offsets = _canonical_offsets([(f(v), p) for v, p in offset_tuples])
+          variant_offsets.setdefault(
+              tuple((dy, dx, _payload_key(p)) for dy, dx, p in offsets),
+              offsets
+          )
+        shape_variants = [
+            Shape([(Vector(dy, dx), p) for dy, dx, p in offsets])
+            for offsets in variant_offsets.values()
+        ]
+        computed[shape_key] = shape_variants
       self.__variants.append(shape_variants)
 
   def __create_grids(self):
     """Create the grids used to model shape region constraints."""
     self.__shape_type_grid: Dict[Point, ArithRef] = {}
+    shape_types = [self.__make_val(i) for i in range(len(self.__shapes))]
+    if not self.__complete:
+      shape_types.append(self.__make_val(-1))
+    constraints = []
     for p in self.__lattice.points:
-      v = Int(f"scst-{ShapeConstrainer._instance_index}-{p.y}-{p.x}")
-      if self.__complete:
-        self.__solver.add(v >= 0)
-      else:
-        self.__solver.add(v >= -1)
-      self.__solver.add(v < len(self.__shapes))
+      v = self.__make_var(f"scst-{ShapeConstrainer._instance_index}-{p.y}-{p.x}")
+      # Enumerate the few legal shape types directly, so that the domain
+      # shares its atoms with the shape placement constraints instead of
+      # introducing separate bounds.
+      constraints.append(Or(*[fast_eq(v, t) for t in shape_types]))
       self.__shape_type_grid[p] = v
+    self.__solver.add(fast_and(*constraints))
 
     self.__shape_instance_grid: Dict[Point, ArithRef] = {}
+    max_instance = len(self.__lattice.points) - 1
+    constraints = []
     for p in self.__lattice.points:
-      v = Int(f"scsi-{ShapeConstrainer._instance_index}-{p.y}-{p.x}")
-      if self.__complete:
-        self.__solver.add(v >= 0)
+      v = self.__make_var(
+          f"scsi-{ShapeConstrainer._instance_index}-{p.y}-{p.x}")
+      if self.__complete and self.__bit_vec_width is not None:
+        # An unsigned comparison also rules out all negative values.
+        constraints.append(ULE(
+            cast(BitVecRef, v), cast(BitVecRef, self.__make_val(max_instance))))
       else:
-        self.__solver.add(v >= -1)
-      self.__solver.add(v < len(self.__lattice.points))
+        constraints.append(v >= self.__make_val(0 if self.__complete else -1))
+        constraints.append(v <= self.__make_val(max_instance))
       self.__shape_instance_grid[p] = v
+    self.__solver.add(fast_and(*constraints))
 
     sample_payload = self.__shapes[0].offsets_with_payloads[0][1]
     self.__shape_payload_grid: Optional[Dict[Point, Payload]] = None
@@ -190,98 +279,240 @@ class ShapeConstrainer(Generic[Payload]):
         self.__shape_payload_grid[p] = pv
 
   def __add_constraints(self):
-    self.__add_grid_agreement_constraints()
+    # The Boolean anchor constants of each shape's possible placements.
+    self.__shape_anchors: List[List[BoolRef]] = [[] for _ in self.__variants]
+    self.__quadtree = self.__make_quadtree()
+    if not self.__complete:
+      # In a complete grid, no cell may have a shape type or instance of -1, so
+      # the grids trivially agree.
+      self.__add_grid_agreement_constraints()
     self.__add_shape_instance_constraints()
     if not self.__allow_copies:
-      for shape_index, shape in enumerate(self.__shapes):
-        self.__add_single_copy_constraints(shape_index, shape)
+      self.__add_single_copy_constraints()
+      if self.__break_symmetries:
+        self.__add_copy_order_constraints()
 
   def __add_grid_agreement_constraints(self):
-    for p, shape_type in self.__shape_type_grid.items():
-      self.__solver.add(
-          Or(
-              fast_and(
-                  shape_type == -1,
-                  self.__shape_instance_grid[p] == -1
-              ),
-              fast_and(
-                  shape_type != -1,
-                  self.__shape_instance_grid[p] != -1
-              )
+    constraints = []
+    get_point_expr = self.__quadtree.get_point_expr
+    for p in self.__lattice.points:
+      # A cell has a shape type if and only if it has a shape instance.
+      constraints.append(
+          fast_eq(
+              get_point_expr((HAS_SHAPE_TYPE, -1), p),
+              get_point_expr((HAS_INSTANCE_ID, -1), p)
           )
       )
+    self.__solver.add(fast_and(*constraints))
 
-  def __add_shape_instance_constraints(self):  # pylint: disable=R0914
-    int_vals = {}
-    for i in range(max(len(self.__lattice.points), len(self.__variants))):
-      int_vals[i] = IntVal(i)
+  def __make_quadtree(self) -> ExpressionQuadTree:
+    """Returns a quadtree of the expressions used by the shape constraints.
 
+    The same cached expressions are shared by all of the constraints that
+    compare a cell against an instance ID or shape type.
+    """
+    shape_instance_grid = self.__shape_instance_grid
+    shape_type_grid = self.__shape_type_grid
+    make_val = self.__make_val
     quadtree = ExpressionQuadTree(self.__lattice.points)
-    for instance_id in [self.__lattice.point_to_index(p) for p in self.__lattice.points]:
-      assert instance_id is not None
-      quadtree.add_expr(
-          (HAS_INSTANCE_ID, instance_id),
-          partial(lambda p, v: fast_eq(self.__shape_instance_grid[p], v), v=int_vals[instance_id]))
-      quadtree.add_expr(
-          (NOT_HAS_INSTANCE_ID, instance_id),
-          partial(lambda p, v: fast_ne(self.__shape_instance_grid[p], v), v=int_vals[instance_id]))
-    for shape_index in range(len(self.__variants)):
-      quadtree.add_expr(
-          (HAS_SHAPE_TYPE, shape_index),
-          partial(lambda p, v: fast_eq(self.__shape_type_grid[p], v), v=int_vals[shape_index]))
-
-    root_options: Dict[Point, List[BoolRef]] = defaultdict(list)
+    quadtree.add_expr_family(
+        HAS_INSTANCE_ID,
+        lambda i, p: fast_eq(shape_instance_grid[p], make_val(i)))
+    quadtree.add_expr_family(
+        NOT_HAS_INSTANCE_ID,
+        lambda i, p: fast_ne(shape_instance_grid[p], make_val(i)))
+    quadtree.add_expr_family(
+        HAS_SHAPE_TYPE,
+        lambda i, p: fast_eq(shape_type_grid[p], make_val(i)))
+    return quadtree
+
+  def __add_shape_instance_constraints(self):  # pylint: disable=R0914,R0915
+    # A point's instance ID is its index in the lattice's list of points.
+    points = self.__lattice.points
+    quadtree = self.__quadtree
+
+    # Each possible placement of a shape variant is represented by a Boolean
+    # anchor constant that implies the placement's constraints. The anchors of
+    # the placements rooted at each point are listed by instance ID.
+    root_options: List[List[BoolRef]] = [[] for _ in points]
+    constraints: List[BoolRef] = []
+    instance_index = ShapeConstrainer._instance_index
+    shape_payload_grid = self.__shape_payload_grid
+    # Payload equalities, keyed by point and payload, shared by all of the
+    # placements that cover the same point with the same payload.
+    payload_eqs: Dict[Tuple, BoolRef] = {}
+    # Integer payloads are lifted to z3 values of the payload grid's sort once
+    # each, rather than once per point.
+    payload_vals: Dict[int, ExprRef] = {}
+    add_constraint = constraints.append
+    get_point_expr = quadtree.get_point_expr
+    get_other_points_expr = quadtree.get_other_points_expr
+    # The placements of each variant that fit within the lattice, as lists of
+    # (instance ID, covered point and payload tuples, instance expression),
+    # keyed by the id of the variants list. Equivalent shapes share a variants
+    # list, so their placements only need to be enumerated once, and the
+    # expression requiring that exactly the covered points have the
+    # placement's instance ID is shared by all of them.
+    placements_by_variants: Dict[int, List[List[Tuple[int, List, BoolRef]]]] = {}
     for shape_index, variants in enumerate(self.__variants):  # pylint: disable=R1702
-      for variant in variants:
-        for root_point in self.__lattice.points:
-          instance_id = self.__lattice.point_to_index(root_point)
-          point_payload_tuples: List[Tuple[Point, Payload]] = []
-          for offset_vector, payload in variant.offsets_with_payloads:
-            point = root_point.translate(offset_vector)
-            if point not in self.__shape_instance_grid:
-              point_payload_tuples = []
-              break
-            point_payload_tuples.append((point, cast(Payload, payload)))
-          if point_payload_tuples:
-            and_terms = []
-            for point, payload in point_payload_tuples:
-              and_terms.append(
-                  quadtree.get_point_expr(
-                      (HAS_INSTANCE_ID, instance_id),
-                      point
-                  )
-              )
-              and_terms.append(
-                  quadtree.get_point_expr(
-                      (HAS_SHAPE_TYPE, shape_index),
-                      point
-                  )
-              )
-              if self.__shape_payload_grid:
-                and_terms.append(self.__shape_payload_grid[point] == payload)
-            and_terms.append(
-                quadtree.get_other_points_expr(
-                    (NOT_HAS_INSTANCE_ID, instance_id),
-                    [t[0] for t in point_payload_tuples]
-                )
+      variants_placements = placements_by_variants.get(id(variants))
+      if variants_placements is None:
+        variants_placements = []
+        for variant in variants:
+          placements = []
+          for instance_id, point_payload_tuples in self.__variant_placements(
+              variant):
+            placement_points = [t[0] for t in point_payload_tuples]
+            instance_terms = [
+                get_point_expr((HAS_INSTANCE_ID, instance_id), point)
+                for point in placement_points
+            ]
+            instance_terms.append(
+                get_other_points_expr(
+                    (NOT_HAS_INSTANCE_ID, instance_id), placement_points))
+            placements.append(
+                (instance_id, point_payload_tuples, fast_and(*instance_terms)))
+          variants_placements.append(placements)
+        placements_by_variants[id(variants)] = variants_placements
+      # Bind the per-shape key and lists outside of the placement loop.
+      shape_type_key = (HAS_SHAPE_TYPE, shape_index)
+      add_anchor = self.__shape_anchors[shape_index].append
+      for placements in variants_placements:
+        for instance_id, point_payload_tuples, instance_expr in placements:
+          and_terms = [instance_expr]
+          if not shape_payload_grid:
+            and_terms.extend(
+                get_point_expr(shape_type_key, point)
+                for point, _ in point_payload_tuples
             )
-            root_options[root_point].append(fast_and(*and_terms))
-    for p in self.__lattice.points:
-      instance_id = self.__lattice.point_to_index(p)
+          else:
+            for point, payload in point_payload_tuples:
+              and_terms.append(get_point_expr(shape_type_key, point))
+              payload_key = (point, _payload_key(payload))
+              payload_eq = payload_eqs.get(payload_key)
+              if payload_eq is None:
+                if isinstance(payload, int):
+                  payload_val = payload_vals.get(payload)
+                  if payload_val is None:
+                    payload_val = shape_payload_grid[point].sort().cast(
+                        payload)
+                    payload_vals[payload] = payload_val
+                  payload = payload_val
+                payload_eq = shape_payload_grid[point] == payload
+                payload_eqs[payload_key] = payload_eq
+              and_terms.append(payload_eq)
+          root_point = points[instance_id]
+          options = root_options[instance_id]
+          anchor = Bool(
+              f"sca-{instance_index}-{shape_index}-"
+              f"{len(options)}-{root_point.y}-{root_point.x}"
+          )
+          add_constraint(Implies(anchor, fast_and(*and_terms)))
+          options.append(anchor)
+          add_anchor(anchor)
+    for instance_id, or_terms in enumerate(root_options):
       not_has_instance_id_expr = quadtree.get_other_points_expr(
           (NOT_HAS_INSTANCE_ID, instance_id), [])
-      or_terms = root_options[p]
       if or_terms:
         or_terms.append(not_has_instance_id_expr)
-        self.__solver.add(Or(*or_terms))
+        constraints.append(Or(*or_terms))
+      else:
+        constraints.append(not_has_instance_id_expr)
+    self.__solver.add(fast_and(*constraints))
+
+  def __variant_placements(  # pylint: disable=R0914
+      self,
+      variant: Shape
+  ) -> List[Tuple[int, List[Tuple[Point, Payload]]]]:
+    """Returns the placements of a shape variant that fit within the lattice.
+
+    Each placement is an instance ID (the index of its root point) and the list
+    of points covered by the placement with their payloads.
+    """
+    # Unpack the offsets once, so that each placement can translate them with
+    # plain integer arithmetic.
+    offset_tuples = [
+        (dy, dx, cast(Payload, payload))
+        for (dy, dx), payload in variant.offsets_with_payloads
+    ]
+    # The range of roots for which the variant fits within the lattice's
+    # bounding box; roots outside of it can be skipped without checking each
+    # offset.
+    min_y, min_x, max_y, max_x = self.__bounding_box
+    root_min_y = min_y - min(t[0] for t in offset_tuples)
+    root_max_y = max_y - max(t[0] for t in offset_tuples)
+    root_min_x = min_x - min(t[1] for t in offset_tuples)
+    root_max_x = max_x - max(t[1] for t in offset_tuples)
+    shape_instance_grid = self.__shape_instance_grid
+    # If the lattice fills its bounding box, every placement within the range
+    # of roots fits, and its points need not be checked individually.
+    fills_bounding_box = len(shape_instance_grid) == (
+        (max_y - min_y + 1) * (max_x - min_x + 1))
+    placements = []
+    for instance_id, (root_y, root_x) in enumerate(self.__lattice.points):
+      if not (root_min_y <= root_y <= root_max_y and
+              root_min_x <= root_x <= root_max_x):
+        continue
+      if fills_bounding_box:
+        placements.append((instance_id, [
+            (Point(root_y + dy, root_x + dx), payload)
+            for dy, dx, payload in offset_tuples
+        ]))
+        continue
+      point_payload_tuples: List[Tuple[Point, Payload]] = []
+      for dy, dx, payload in offset_tuples:
+        point = Point(root_y + dy, root_x + dx)
+        if point not in shape_instance_grid:
+          break
+        point_payload_tuples.append((point, payload))
+      else:
+        placements.append((instance_id, point_payload_tuples))
+    return placements
+
+  def __add_single_copy_constraints(self):
+    constraints = []
+    get_point_expr = self.__quadtree.get_point_expr
+    for shape_index, shape in enumerate(self.__shapes):
+      sum_terms = []
+      for p in self.__lattice.points:
+        sum_terms.append((get_point_expr((HAS_SHAPE_TYPE, shape_index), p), 1))
+      constraints.append(PbEq(sum_terms, len(shape.offsets_with_payloads)))
+      # Exactly one placement of the shape may be chosen.
+      anchors = self.__shape_anchors[shape_index]
+      if anchors:
+        constraints.append(PbEq([(a, 1) for a in anchors], 1))
       else:
-        self.__solver.add(not_has_instance_id_expr)
+        constraints.append(BoolVal(False))
+    self.__solver.add(fast_and(*constraints))
+
+  def __add_copy_order_constraints(self):
+    """Orders the instances of equivalent shapes to break their symmetry.
 
-  def __add_single_copy_constraints(self, shape_index, shape):
-    sum_terms = []
-    for shape_type in self.__shape_type_grid.values():
-      sum_terms.append((shape_type == shape_index, 1))
-    self.__solver.add(PbEq(sum_terms, len(shape.offsets_with_payloads)))
+    Equivalent shapes share the same list of variants. When copies aren't
+    allowed, the placements of equivalent shapes are interchangeable, so
+    require their instance IDs to increase with their shape indices.
+    """
+    get_point_expr = self.__quadtree.get_point_expr
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for shape_index, variants in enumerate(self.__variants):
+      groups[id(variants)].append(shape_index)
+    constraints = []
+    for shape_indices in groups.values():
+      if len(shape_indices) < 2:
+        continue
+      instance_ids = []
+      for shape_index in shape_indices:
+        instance_id = self.__make_var(
+            f"scio-{ShapeConstrainer._instance_index}-{shape_index}")
+        for p, shape_instance in self.__shape_instance_grid.items():
+          constraints.append(Implies(
+              get_point_expr((HAS_SHAPE_TYPE, shape_index), p),
+              fast_eq(shape_instance, instance_id)
+          ))
+        instance_ids.append(instance_id)
+      for a, b in zip(instance_ids, instance_ids[1:]):
+        constraints.append(a < b)
+    self.__solver.add(fast_and(*constraints))
 
   @property
   def solver(self) -> Solver:
@@ -320,43 +551,35 @@ class ShapeConstrainer(Generic[Payload]):
 
     Should be called only after the solver has been checked.
     """
-    model = self.__solver.model()
-    min_y = min(p.y for p in self.__shape_type_grid)
-    min_x = min(p.x for p in self.__shape_type_grid)
-    max_y = max(p.y for p in self.__shape_type_grid)
-    max_x = max(p.x for p in self.__shape_type_grid)
+    values = model_values(
+        self.__solver, self.__shape_type_grid,
+        self.__bit_vec_width is not None)
+    min_y, min_x, max_y, max_x = self.__bounding_box
     for y in range(min_y, max_y + 1):
+      parts = []
       for x in range(min_x, max_x + 1):
-        p = Point(y, x)
-        shape_index = -1
-        if p in self.__shape_type_grid:
-          v = self.__shape_type_grid[p]
-          shape_index = model.eval(v).as_long()
+        shape_index = values.get(Point(y, x), -1)
         if shape_index >= 0:
-          sys.stdout.write(f"{shape_index:3}")
+          parts.append(f"{shape_index:3}")
         else:
-          sys.stdout.write("   ")
-      print()
+          parts.append("   ")
+      sys.stdout.write("".join(parts) + "\n")
 
   def print_shape_instances(self):
     """Prints the shape instance ID assigned to each cell.
 
     Should be called only after the solver has been checked.
     """
-    model = self.__solver.model()
-    min_y = min(p.y for p in self.__shape_instance_grid)
-    min_x = min(p.x for p in self.__shape_instance_grid)
-    max_y = max(p.y for p in self.__shape_instance_grid)
-    max_x = max(p.x for p in self.__shape_instance_grid)
+    values = model_values(
+        self.__solver, self.__shape_instance_grid,
+        self.__bit_vec_width is not None)
+    min_y, min_x, max_y, max_x = self.__bounding_box
     for y in range(min_y, max_y + 1):
+      parts = []
       for x in range(min_x, max_x + 1):
-        p = Point(y, x)
-        shape_instance = -1
-        if p in self.__shape_instance_grid:
-          v = self.__shape_instance_grid[p]
-          shape_instance = model.eval(v).as_long()
+        shape_instance = values.get(Point(y, x), -1)
         if shape_instance >= 0:
-          sys.stdout.write(f"{shape_instance:3}")
+          parts.append(f"{shape_instance:3}")
         else:
-          sys.stdout.write("   ")
-      print()
+          parts.append("   ")
+      sys.stdout.write("".join(parts) + "\n")
@@ -19,6 +19,7 @@ def main_ctx() -> Context: ...
 class AstRef(Z3PPObject):
   def __init__(self, ast: Z3_ast, ctx: Optional[Context] = None): ...
   def as_ast(self) -> Z3_ast: ...
+  def get_id(self) -> int: ...
 
 def eq(a: AstRef, b: AstRef) -> bool: ...
 
@@ -81,7 +82,7 @@ class IntNumRef(ArithRef):
   def as_string(self) -> str: ...
 
 class BitVecRef(ExprRef):
-  pass
+  def size(self) -> int: ...
 
 class BitVecNumRef(BitVecRef):
   def as_long(self) -> int: ...
@@ -109,8 +110,14 @@ def Sum(*args: ArithRefOrLiteral) -> ArithRef: ...
 def Xor(a: BoolRef, b: BoolRef) -> BoolRef: ...
 
 def BV2Int(a: BitVecRef) -> IntNumRef: ...
+def UGE(a: BitVecRef, b: BitVecRef) -> BoolRef: ...
+def UGT(a: BitVecRef, b: BitVecRef) -> BoolRef: ...
+def ULE(a: BitVecRef, b: BitVecRef) -> BoolRef: ...
+def ULT(a: BitVecRef, b: BitVecRef) -> BoolRef: ...
+def is_bv(a: ExprRef) -> bool: ...
 def Concat(*args: BitVecRef) -> BitVecRef: ...
 def Extract(high: int, low: int, bv: BitVecRef) -> BitVecRef: ...
+def ZeroExt(n: int, a: BitVecRef) -> BitVecRef: ...
 
 class CheckSatResult:
   pass
@@ -120,12 +127,15 @@ unsat: CheckSatResult = ...
 unknown: CheckSatResult = ...
 
 class ModelRef(Z3PPObject):
-  def eval(self, t: ArithRef) -> IntNumRef: ...
+  def __getitem__(self, t: ExprRef) -> Optional[IntNumRef]: ...
+  def eval(self, t: ExprRef) -> IntNumRef: ...
 
 class Solver(Z3PPObject):
   def add(self, *args: ExprRef) -> Solver: ...
   def check(self, *assumptions: ExprRef) -> CheckSatResult: ...
   def model(self) -> ModelRef: ...
+  def push(self) -> None: ...
+  def pop(self, num: int = 1) -> None: ...
 
 class Datatype:
   def __init__(self, name: str): ...
@@ -1,7 +1,7 @@
 """Tests for paths module."""
 
 import unittest
-from z3 import Not, Or
+from z3 import BitVec, Int, Not, Or, Solver, eq, is_true, sat
 
 from grilops.geometry import Point, get_square_lattice
 from grilops.grids import SymbolGrid
@@ -168,3 +168,66 @@ class PathConstrainerTestCase(unittest.TestCase):
 
     self.assertTrue(sg.solve())
     self.assertTrue(sg.is_unique())
+
+
+class PathSymbolSetTestCase(unittest.TestCase):
+  """Unittest for PathSymbolSet."""
+
+  def check_predicates(self, sym, symbol, value):
+    """Returns the values of the symbol predicates when symbol == value."""
+    solver = Solver()
+    solver.add(symbol == value)
+    self.assertEqual(solver.check(), sat)
+    model = solver.model()
+    return tuple(
+      is_true(model.eval(predicate(symbol)))
+      for predicate in (sym.is_path, sym.is_path_segment, sym.is_terminal)
+    )
+
+  def test_bit_vector_predicates(self):
+    lattice = get_square_lattice(3)
+    sym = PathSymbolSet(lattice)
+    # Indices 0 through 5 are path segments, and 6 through 9 are terminals.
+    b = BitVec("b", 8)
+    self.assertEqual(self.check_predicates(sym, b, 3), (True, True, False))
+    self.assertEqual(self.check_predicates(sym, b, 7), (True, False, True))
+    self.assertEqual(self.check_predicates(sym, b, 10), (False, False, False))
+    # These values are negative as signed bit-vectors, so only an unsigned
+    # comparison excludes them from the path range.
+    self.assertEqual(self.check_predicates(sym, b, 200), (False, False, False))
+    self.assertEqual(self.check_predicates(sym, b, 255), (False, False, False))
+
+  def test_int_predicates(self):
+    lattice = get_square_lattice(3)
+    sym = PathSymbolSet(lattice)
+    x = Int("x")
+    self.assertTrue(eq(sym.is_path(x), x < 10))
+    self.assertTrue(eq(sym.is_path_segment(x), x < 6))
+    self.assertEqual(self.check_predicates(sym, x, 3), (True, True, False))
+    self.assertEqual(self.check_predicates(sym, x, 7), (True, False, True))
+    self.assertEqual(self.check_predicates(sym, x, -1), (True, True, False))
+
+  def test_predicates_cached(self):
+    lattice = get_square_lattice(3)
+    sym = PathSymbolSet(lattice)
+    x = Int("x")
+    y = Int("y")
+
+    is_path = sym.is_path(x)
+    is_terminal = sym.is_terminal(x)
+    self.assertIs(sym.is_path(x), is_path)
+    self.assertIs(sym.is_terminal(x), is_terminal)
+    self.assertIs(sym.is_path(Int("x")), is_path)
+
+    # Different predicates and different symbols don't share cache entries.
+    self.assertFalse(eq(sym.is_path_segment(x), is_path))
+    self.assertFalse(eq(is_terminal, is_path))
+    self.assertTrue(eq(sym.is_path(y), y < 10))
+
+    # Appending a symbol after predicates have been cached doesn't change
+    # which symbols they match.
+    sym.append("BLANK", " ")
+    self.assertIs(sym.is_path(x), is_path)
+    self.assertEqual(
+      self.check_predicates(sym, x, sym.BLANK), (False, False, False))
+    self.assertEqual(self.check_predicates(sym, x, 8), (True, False, True))
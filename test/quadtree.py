@@ -62,3 +62,38 @@ class ExpressionQuadTreeTestCase(unittest.TestCase):
 
     expr = t.get_other_points_expr("test", [])
     self.assertEqual(simplify(expr), And(y == 0, y == 1))
+
+  def test_get_other_points_expr_cached(self):
+    """Unittest for caching in ExpressionQuadTree.get_other_points_expr."""
+    t = ExpressionQuadTree([Point(y, x) for y in range(4) for x in range(4)])
+    y = Int("y")
+    t.add_expr("test", lambda p: p.y == y)
+
+    expr = t.get_other_points_expr("test", [Point(0, 1), Point(2, 3)])
+    self.assertIs(
+        t.get_other_points_expr("test", [Point(2, 3), Point(0, 1)]), expr)
+
+  def test_expr_family(self):
+    """Unittest for ExpressionQuadTree.add_expr_family."""
+    points = [Point(y, x) for y in range(2) for x in range(2)]
+    t = ExpressionQuadTree(points)
+    y = Int("y")
+    t.add_expr_family("test", lambda i, p: p.y + i == y)
+
+    for p in points:
+      self.assertEqual(t.get_point_expr(("test", 3), p), p.y + 3 == y)
+    expr = t.get_other_points_expr(("test", 1), [Point(1, 0), Point(1, 1)])
+    self.assertEqual(simplify(expr), y == 1)
+
+  def test_get_point_expr_cached(self):
+    """Unittest for caching in ExpressionQuadTree.get_point_expr."""
+    points = [Point(y, x) for y in range(4) for x in range(4)]
+    t = ExpressionQuadTree(points)
+    y = Int("y")
+    calls = []
+    t.add_expr("test", lambda p: calls.append(p) or p.y == y)
+
+    for p in points:
+      self.assertIs(t.get_point_expr("test", p), t.get_point_expr("test", p))
+    list(t.get_exprs("test"))
+    self.assertEqual(sorted(calls), points)
@@ -0,0 +1,85 @@
+"""Tests for regions module."""
+
+import unittest
+from z3 import sat, unsat
+
+from grilops.geometry import Point, get_rectangle_lattice
+from grilops.regions import RegionConstrainer
+
+
+class RegionConstrainerTestCase(unittest.TestCase):
+  """Unittest for RegionConstrainer."""
+
+  def check_rows(self, use_bit_vectors):
+    lattice = get_rectangle_lattice(2, 3)
+    rc = RegionConstrainer(lattice, use_bit_vectors=use_bit_vectors)
+
+    for p in lattice.points:
+      rc.solver.add(rc.region_size_grid[p] == 3)
+    rc.solver.add(
+      rc.region_id_grid[Point(0, 0)] != rc.region_id_grid[Point(1, 0)])
+
+    self.assertEqual(rc.solver.check(), sat)
+    model = rc.solver.model()
+    for p in lattice.points:
+      self.assertEqual(
+        model.eval(rc.region_id_grid[p]).as_long(),
+        model.eval(rc.region_id_grid[Point(p.y, 0)]).as_long()
+      )
+      self.assertEqual(model.eval(rc.region_size_grid[p]).as_long(), 3)
+
+  def test_int_rows(self):
+    self.check_rows(use_bit_vectors=False)
+
+  def test_bit_vector_rows(self):
+    self.check_rows(use_bit_vectors=True)
+
+  def test_bit_vector_incomplete(self):
+    lattice = get_rectangle_lattice(1, 7)
+    rc = RegionConstrainer(lattice, complete=False, use_bit_vectors=True)
+
+    x = rc.parent_type_to_index("X")
+    rc.solver.add(rc.parent_grid[Point(0, 0)] == x)
+    for p in lattice.points[1:]:
+      rc.solver.add(rc.parent_grid[p] != x)
+      rc.solver.add(rc.region_id_grid[p] == rc.region_id_grid[Point(0, 1)])
+
+    self.assertEqual(rc.solver.check(), sat)
+    model = rc.solver.model()
+    self.assertEqual(
+      model.eval(rc.region_id_grid[Point(0, 0)]).as_signed_long(), -1)
+    self.assertEqual(
+      model.eval(rc.region_size_grid[Point(0, 0)]).as_signed_long(), -1)
+    for p in lattice.points[1:]:
+      self.assertEqual(model.eval(rc.region_size_grid[p]).as_long(), 6)
+
+  def test_bit_vector_power_of_two_size(self):
+    lattice = get_rectangle_lattice(1, 8)
+    rc = RegionConstrainer(lattice, use_bit_vectors=True)
+
+    for p in lattice.points:
+      rc.solver.add(rc.region_id_grid[p] == rc.region_id_grid[Point(0, 0)])
+
+    self.assertEqual(rc.solver.check(), sat)
+    model = rc.solver.model()
+    for p in lattice.points:
+      self.assertEqual(model.eval(rc.region_size_grid[p]).as_long(), 8)
+
+  def test_bit_vector_large_min_region_size(self):
+    lattice = get_rectangle_lattice(2, 3)
+    rc = RegionConstrainer(lattice, min_region_size=20, use_bit_vectors=True)
+    self.assertEqual(rc.solver.check(), unsat)
+
+  def test_scope(self):
+    lattice = get_rectangle_lattice(1, 4)
+    rc = RegionConstrainer(lattice)
+
+    with rc.scope() as solver:
+      for p in lattice.points:
+        solver.add(rc.region_size_grid[p] == 3)
+      self.assertEqual(solver.check(), unsat)
+
+    with rc.scope() as solver:
+      for p in lattice.points:
+        solver.add(rc.region_size_grid[p] == 2)
+      self.assertEqual(solver.check(), sat)
@@ -2,9 +2,9 @@
 
 import unittest
 
-from z3 import Datatype, IntSort
+from z3 import BitVecVal, Datatype, IntSort, sat
 
-from grilops.geometry import Vector, get_square_lattice
+from grilops.geometry import Point, Vector, get_rectangle_lattice, get_square_lattice
 from grilops.grids import SymbolGrid
 from grilops.shapes import Shape, ShapeConstrainer
 from grilops.symbols import make_number_range_symbol_set
@@ -55,6 +55,79 @@ class ShapeConstrainerTestCase(unittest.TestCase):
       self.assertEqual(solved_grid[p], expected[p.y][p.x])
     self.assertTrue(sg.is_unique())
 
+  def test_equivalent_shapes_ordered(self):
+    lattice = get_rectangle_lattice(1, 4)
+    sym = make_number_range_symbol_set(0, 1)
+    sg = SymbolGrid(lattice, sym)
+
+    sc = ShapeConstrainer(
+      lattice,
+      [
+        Shape([Vector(0, 0), Vector(0, 1)]),
+        Shape([Vector(0, 0), Vector(0, 1)]),
+      ],
+      solver=sg.solver,
+      complete=True
+    )
+
+    for p in lattice.points:
+      sg.solver.add(sg.cell_is(p, sc.shape_type_grid[p]))
+
+    self.assertTrue(sg.solve())
+    solved_grid = sg.solved_grid()
+    expected = [0, 0, 1, 1]
+    for p in lattice.points:
+      self.assertEqual(solved_grid[p], expected[p.x])
+    self.assertTrue(sg.is_unique())
+
+  def test_equivalent_shapes_unordered(self):
+    lattice = get_rectangle_lattice(1, 4)
+    sym = make_number_range_symbol_set(0, 1)
+    sg = SymbolGrid(lattice, sym)
+
+    sc = ShapeConstrainer(
+      lattice,
+      [
+        Shape([Vector(0, 0), Vector(0, 1)]),
+        Shape([Vector(0, 0), Vector(0, 1)]),
+      ],
+      solver=sg.solver,
+      complete=True,
+      break_symmetries=False
+    )
+
+    for p in lattice.points:
+      sg.solver.add(sg.cell_is(p, sc.shape_type_grid[p]))
+
+    self.assertTrue(sg.solve())
+    self.assertFalse(sg.is_unique())
+
+  def test_bit_vectors(self):
+    lattice = get_rectangle_lattice(1, 5)
+    sc = ShapeConstrainer(
+      lattice,
+      [
+        Shape([Vector(0, 0), Vector(0, 1)]),
+        Shape([Vector(0, 0), Vector(0, 1)]),
+      ],
+      use_bit_vectors=True
+    )
+    sc.solver.add(sc.shape_type_grid[Point(0, 2)] == -1)
+
+    self.assertEqual(sc.solver.check(), sat)
+    model = sc.solver.model()
+    expected_types = [0, 0, -1, 1, 1]
+    expected_instances = [0, 0, -1, 3, 3]
+    for p in lattice.points:
+      self.assertEqual(
+        model.eval(sc.shape_type_grid[p]).as_signed_long(),
+        expected_types[p.x]
+      )
+      self.assertEqual(
+        model.eval(sc.shape_instance_grid[p]).as_signed_long(),
+        expected_instances[p.x]
+      )
+
   def test_int_payloads(self):
     lattice = get_square_lattice(3)
     sym = make_number_range_symbol_set(1, 9)
@@ -92,6 +165,21 @@ class ShapeConstrainerTestCase(unittest.TestCase):
       self.assertEqual(solved_grid[p], lattice.point_to_index(p) + 1)
     self.assertTrue(sg.is_unique())
 
+  def test_mixed_bit_vector_and_int_payloads(self):
+    lattice = get_rectangle_lattice(1, 2)
+    sc = ShapeConstrainer(
+      lattice,
+      [Shape([(Vector(0, 0), BitVecVal(1, 8)), (Vector(0, 1), 2)])],
+      complete=True
+    )
+
+    self.assertEqual(sc.solver.check(), sat)
+    model = sc.solver.model()
+    self.assertEqual(
+      model.eval(sc.shape_payload_grid[Point(0, 0)]).as_long(), 1)
+    self.assertEqual(
+      model.eval(sc.shape_payload_grid[Point(0, 1)]).as_long(), 2)
+
   def test_datatype_payloads(self):
     lattice = get_square_lattice(3)
     sym = make_number_range_symbol_set(0, 2)